@@ -0,0 +1,134 @@
+#include "zerynth.h"
+
+#define STTS751_REG_TEMPERATURE_H 0x00
+#define STTS751_REG_TEMPERATURE_L 0x02
+#define STTS751_TIMEOUT_MS        100
+
+/*
+ * Reads a single register. Register pointer auto-increment is not
+ * guaranteed by the datasheet, so every register gets its own transaction.
+ * The slave address is set right before the transfer and both run with the
+ * GIL held: no other thread can start an I2C operation, possibly towards a
+ * different slave on the same bus, in between.
+ */
+static int32_t stts751_read_reg(int32_t drvid, int32_t addr, uint8_t reg, uint8_t *out) {
+    vhalI2CSetAddr(drvid & 0xff, addr);
+    return vhalI2CTransmit(drvid & 0xff, &reg, 1, out, 1, TIME_U(STTS751_TIMEOUT_MS, MILLIS));
+}
+
+/*
+ * Reads TEMP_H, TEMP_L and TEMP_H again; if a conversion completed in
+ * between, TEMP_L is read again so that both bytes belong to the same sample.
+ */
+static int32_t stts751_read_temp_hl(int32_t drvid, int32_t addr, uint8_t *h, uint8_t *l) {
+    uint8_t h2;
+    int32_t err;
+
+    err = stts751_read_reg(drvid, addr, STTS751_REG_TEMPERATURE_H, h);
+    if (err == 0)
+        err = stts751_read_reg(drvid, addr, STTS751_REG_TEMPERATURE_L, l);
+    if (err == 0)
+        err = stts751_read_reg(drvid, addr, STTS751_REG_TEMPERATURE_H, &h2);
+    if (err == 0 && h2 != *h) {
+        *h = h2;
+        err = stts751_read_reg(drvid, addr, STTS751_REG_TEMPERATURE_L, l);
+    }
+    return err;
+}
+
+/*
+ * _stts751_read_into(drvid, addr, reg, buf)
+ *
+ * Reads register reg into buf[0] of the bytearray buf, without allocating
+ * a new object.
+ */
+C_NATIVE(_stts751_read_into) {
+    NATIVE_UNWARN();
+    int32_t drvid;
+    int32_t addr;
+    int32_t reg;
+    uint8_t *out;
+    int32_t outlen;
+    int32_t err;
+
+    if (parse_py_args("iiis", nargs, args, &drvid, &addr, &reg, &out, &outlen) != 4)
+        return ERR_TYPE_EXC;
+    if (outlen < 1)
+        return ERR_VALUE_EXC;
+
+    err = stts751_read_reg(drvid, addr, reg & 0xff, out);
+    if (err != 0)
+        return ERR_IOERROR_EXC;
+
+    *res = MAKE_NONE();
+    return ERR_OK;
+}
+
+/*
+ * _stts751_read_temp(drvid, addr, raw)
+ *
+ * Reads the temperature registers and returns the temperature in °C as a
+ * float, or the raw 16 bit register value as an int if raw is true.
+ */
+C_NATIVE(_stts751_read_temp) {
+    NATIVE_UNWARN();
+    int32_t drvid;
+    int32_t addr;
+    int32_t raw;
+    int32_t err;
+    uint8_t h;
+    uint8_t l;
+
+    if (parse_py_args("iii", nargs, args, &drvid, &addr, &raw) != 3)
+        return ERR_TYPE_EXC;
+
+    err = stts751_read_temp_hl(drvid, addr, &h, &l);
+    if (err != 0)
+        return ERR_IOERROR_EXC;
+
+    if (raw) {
+        *res = PSMALLINT_NEW((h << 8) | l);
+    } else {
+        /* sign extend TEMP_H:TEMP_L, 1/256 °C per LSB */
+        *res = (PObject *)pfloat_new((int16_t)((h << 8) | l) / 256.0);
+    }
+    return ERR_OK;
+}
+
+/*
+ * _stts751_read_samples(drvid, addr, buf, n, period_ms)
+ *
+ * Performs n temperature reads spaced by period_ms milliseconds and stores
+ * the raw TEMP_H, TEMP_L pairs in the bytearray buf (at least 2*n bytes).
+ * The GIL is released only while sleeping between samples.
+ */
+C_NATIVE(_stts751_read_samples) {
+    NATIVE_UNWARN();
+    int32_t drvid;
+    int32_t addr;
+    uint8_t *out;
+    int32_t outlen;
+    int32_t n;
+    int32_t period_ms;
+    int32_t err;
+    int32_t i;
+
+    if (parse_py_args("iisii", nargs, args, &drvid, &addr, &out, &outlen, &n, &period_ms) != 5)
+        return ERR_TYPE_EXC;
+    if (n < 0 || period_ms < 0 || outlen < 2 * n)
+        return ERR_VALUE_EXC;
+
+    for (i = 0; i < n; i++) {
+        err = stts751_read_temp_hl(drvid, addr, &out[2 * i], &out[2 * i + 1]);
+        if (err != 0)
+            return ERR_IOERROR_EXC;
+        if (i < n - 1) {
+            RELEASE_GIL();
+            vosThSleep(TIME_U(period_ms, MILLIS));
+            ACQUIRE_GIL();
+        }
+    }
+
+    *res = MAKE_NONE();
+    return ERR_OK;
+}
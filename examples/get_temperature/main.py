@@ -6,10 +6,23 @@
 ################################################################################
 
 import streams
+import timers
+import queue
 from stm.stts751 import stts751
 
 streams.serial()
 
+# samples are formatted and printed by a background thread, so serial
+# output never delays the next reading
+samples = queue.Queue(64)
+
+def writer():
+    while True:
+        raw_temp, temp = samples.get()
+        print("Raw Temperature:", raw_temp)
+        print("Temperature:", temp)
+        print("--------------------------------------------------------")
+
 try:
     # Setup sensor 
     print("start...")
@@ -24,12 +37,19 @@ except Exception as e:
     print("Error: ",e)
     
 try:
+    thread(writer)
+    # deadline-based schedule: the time spent reading and printing does not
+    # add up to the polling period
+    next_t = timers.now()
     while True:
         raw_temp = stts.get_temp(raw=True)
-        print("Raw Temperature:", raw_temp)
         temp = stts.get_temp()
-        print("Temperature:", temp)
-        print("--------------------------------------------------------")
-        sleep(5000)
+        try:
+            samples.put((raw_temp, temp), False)
+        except queue.QueueFull:
+            # queue full: drop the sample rather than stall the loop
+            pass
+        next_t += stts.next_poll_interval(temp)
+        sleep(max(0, next_t - timers.now()))
 except Exception as e:
     print("Error2: ",e)
\ No newline at end of file
@@ -0,0 +1,30 @@
+################################################################################
+# Threshold Events Example
+#
+# Created: 2026-10-15 18:00:26.000000
+#
+################################################################################
+
+import streams
+from stm.stts751 import stts751
+
+streams.serial()
+
+try:
+    # Setup sensor: the STTS751 interrupt output is wired to D2
+    print("start...")
+    stts = stts751.STTS751(I2C0, int_pin=D2)
+    stts.set_thresholds(20, 30)
+    print("Ready!")
+    print("--------------------------------------------------------")
+except Exception as e:
+    print("Error: ",e)
+
+try:
+    while True:
+        status, temp = stts.wait_for_event()
+        print("Status:", status)
+        print("Temperature:", temp)
+        print("--------------------------------------------------------")
+except Exception as e:
+    print("Error2: ",e)
\ No newline at end of file
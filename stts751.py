@@ -12,6 +12,8 @@ Its highlight is that it outputs its measurement in a 9-bit to 12-bit (configura
 
 
 import i2c
+import threading
+import timers
 
 STTS751_MODEL_0 = 0x00  # Model 0 (default)
 STTS751_MODEL_1 = 0x40  # Model 1 
@@ -41,6 +43,24 @@ ODR_AVAILABLE = {
     "ODR_32Hz"     : 0x09,
 }
 
+_ODR_VALUES   = frozenset(ODR_AVAILABLE.values())
+_ODR_OFF      = ODR_AVAILABLE["ODR_OFF"]
+_ODR_ONE_SHOT = ODR_AVAILABLE["ODR_ONE_SHOT"]
+
+# (odr, resolution) pairs not supported by the sensor
+_FORBIDDEN = frozenset((
+    (ODR_AVAILABLE["ODR_16Hz"], STTS751_RES_12),
+    (ODR_AVAILABLE["ODR_32Hz"], STTS751_RES_12),
+    (ODR_AVAILABLE["ODR_32Hz"], STTS751_RES_11),
+))
+
+# power_profile -> (odr, resolution)
+_PROFILES = {
+    "low_power": (ODR_AVAILABLE["ODR_ONE_SHOT"], STTS751_RES_9),
+    "balanced" : (ODR_AVAILABLE["ODR_1Hz"], STTS751_RES_10),
+    "high_res" : (ODR_AVAILABLE["ODR_125mHz"], STTS751_RES_12),
+}
+
 REG_TEMPERATURE_H    = 0x00
 REG_STATUS           = 0x01
 REG_TEMPERATURE_L    = 0x02
@@ -63,22 +83,72 @@ CONF_RUNSTOP   = 0x40
 CONF_RES_MASK  = 0x0c
 CONV_RATE_MASK = 0x0f
 
+SMBUS_TIMEOUT_EN = 0x80
+
+_LSB_C = 1.0 / 256.0 # °C per LSB of the 16 bit temperature value
+
+# upper bound of the conversion time per resolution, in ms
+_CONV_TIME_MS = {
+    STTS751_RES_9 : 20,
+    STTS751_RES_10: 40,
+    STTS751_RES_11: 80,
+    STTS751_RES_12: 160,
+}
+_CONV_POLL_MS = 10 # STATUS polling interval once the conversion time elapsed
+
 STATUS_BUSY  = 0x80
 STATUS_THIGH = 0x40
 STATUS_LOW   = 0x20
 STATUS_THURM = 0x01
 
+@c_native("_stts751_read_into", ["csrc/stts751.c"], [])
+def _stts751_read_into(drvid, addr, reg, buf):
+    pass
+
+@c_native("_stts751_read_temp", ["csrc/stts751.c"], [])
+def _stts751_read_temp(drvid, addr, raw):
+    pass
+
+@c_native("_stts751_read_samples", ["csrc/stts751.c"], [])
+def _stts751_read_samples(drvid, addr, buf, n, period_ms):
+    pass
+
+def _s8(v):
+    # signed level -> two's complement register byte
+    if v < -127 or v > 127:
+        raise ValueError
+    return v & 0xFF
+
+def _from_s8(b):
+    return b - 256 if b & 0x80 else b
+
 
 class STTS751():
     """
 
-.. class:: STTS751(drvsel,address=0x48,clk=400000)
+.. class:: STTS751(drvsel,address=0x48,clk=400000,int_pin=None,power_profile="high_res",odr=None,resolution=None)
 
     Creates an intance of a new STTS751.
 
     :param drvsel: I2C Bus used `( I2C0 )`
     :param address: Slave address, default 0x48
     :param clk: Clock speed, default 400kHz
+    :param int_pin: Pin connected to the sensor's interrupt output, default None. Required by :meth:`wait_for_event`
+    :param power_profile: Initial odr/resolution pair, default "high_res". Available values are:
+
+        ============ ============================== ================
+        Profile      ODR                            Resolution
+        ============ ============================== ================
+        low_power    ODR_AVAILABLE["ODR_ONE_SHOT"]  STTS751_RES_9
+        balanced     ODR_AVAILABLE["ODR_1Hz"]       STTS751_RES_10
+        high_res     ODR_AVAILABLE["ODR_125mHz"]    STTS751_RES_12
+        ============ ============================== ================
+
+    :param odr: Initial Output Data Rate, overrides the one of *power_profile* (see :meth:`enable`)
+    :param resolution: Initial resolution, overrides the one of *power_profile* (see :meth:`enable`)
+
+    Apart from :meth:`wait_for_event`, which may run in its own thread alongside :meth:`get_temp`, :meth:`read_temp` and :meth:`get_status`,
+    an instance must be used from a single thread.
 
     Example: ::
 
@@ -88,66 +158,119 @@ class STTS751():
         temp = temp_sens.get_temp()
 
     """
-    def __init__(self, drvsel, address=0x48, clk=400000):
+    def __init__(self, drvsel, address=0x48, clk=400000, int_pin=None, power_profile="high_res", odr=None, resolution=None):
+        if power_profile not in _PROFILES:
+            raise ValueError
+        prof_odr, prof_res = _PROFILES[power_profile]
+        if odr is None:
+            odr = prof_odr
+        if resolution is None:
+            resolution = prof_res
+
         self.port             = i2c.I2C(drvsel, address, clk)
-        self.odr              = ODR_AVAILABLE["ODR_125mHz"]
-        self.resolution       = STTS751_RES_12
+        self.odr              = None
+        self.resolution       = None
         self.low_th           = 1
         self.high_th          = 50
         self.int_enable       = False
         self.therm_limit      = 0
         self.therm_hyst_limit = 0
         self.timeout          = False
+        self._w2              = bytearray(2)
+        self._r1              = bytearray(1)
+        self._int_event       = None
 
         try:
             self.port.start()
         except PeripheralError as e:
             print(e)
 
-        self.enable(self.odr, self.resolution)
-        self.set_low_temp_threshold(self.low_th)
-        self.set_high_temp_threshold(self.high_th)
+        # write-back cache of the configuration registers: read once here,
+        # then only written to, and only when the value changes
+        self._conf_cache = self._read_into(REG_CONFIGURATION, self._r1)[0]
+        self._cr_cache   = self._read_into(REG_CONV_RATE, self._r1)[0]
+        self._to_cache   = self._read_into(REG_SMBUS_TIMEOUT, self._r1)[0]
+
+        self.enable(odr, resolution)
+        self.set_thresholds(self.low_th, self.high_th)
         self.set_event_interrupt(True)
         self.set_timeout(False)
-        self.therm_limit = self._read(REG_THERM, 1)[0]
-        self.therm_hyst_limit = self._read(REG_THERM_HYSTERESIS, 1)[0]
-
-    def _write(self, addr, data):
-        buffer = bytearray(1)
-        buffer[0] = addr
-        buffer.append(data)
-        self.port.write(buffer)
+        self.therm_limit = _from_s8(self._read_into(REG_THERM, self._r1)[0])
+        self.therm_hyst_limit = _from_s8(self._read_into(REG_THERM_HYSTERESIS, self._r1)[0])
 
-    def _read(self, addr, num_bytes):
-        return self.port.write_read(addr, num_bytes)
+        if int_pin is not None:
+            self._int_event = threading.Event()
+            pinMode(int_pin, INPUT_PULLUP)
+            onPinFall(int_pin, self._isr)
 
-    def _set_resolution(self, nbit):
-        try:
-            conf = self._read(REG_CONFIGURATION, 1)[0]
-            conf |= nbit
-            self._write(REG_CONFIGURATION, conf)
-            return True
-        except Exception as e:
-            # print(e)
-            return False
+    def _isr(self):
+        # the interrupt output is active low; just signal the waiting thread
+        self._int_event.set()
 
-    def _set_odr(self, odr):
+    def _write(self, addr, data):
+        self._w2[0] = addr
+        self._w2[1] = data
+        self.port.write(self._w2)
+
+    def _read_into(self, addr, buf):
+        # fills buf[0] instead of allocating a new bytearray per read.
+        # self._r1 is shared: get_status, which may run concurrently with
+        # wait_for_event, passes its own buffer
+        _stts751_read_into(self.port.drvid, self.port.addr, addr, buf)
+        return buf
+
+    def _threshold_bytes(self, level):
+        # level in °C -> (LIMIT_H, LIMIT_L) register bytes
+        raw = (level << 8) & 0xFFFF
+        return raw >> 8, raw & 0xFF
+
+    def _write_threshold(self, base_h, level):
+        # LIMIT_L follows LIMIT_H; register pointer auto-increment is not
+        # guaranteed, so each byte gets its own write
+        rh, rl = self._threshold_bytes(level)
+        self._write(base_h, rh)
+        self._write(base_h + 1, rl)
+
+    def _decode(self, tmp_h, tmp_l):
+        # conversion of the raw pairs captured by read_samples
+        tmp_raw = (tmp_h << 8) + tmp_l
+        # two's complement sign extension of the 16 bit value
+        tmp_raw -= (tmp_raw & 0x8000) << 1
+        return tmp_raw * _LSB_C
+
+    def _res_conf(self, conf, nbit):
+        # rewrite the whole resolution field, an OR alone can't clear
+        # bits left over from the previous resolution
+        return (conf & ~CONF_RES_MASK) | (nbit & CONF_RES_MASK)
+
+    def _odr_conf(self, conf, odr):
+        # ODR_OFF and ODR_ONE_SHOT put the sensor in standby (RUN/STOP set)
+        if odr & 0x80:
+            return conf | CONF_RUNSTOP
+        return conf & ~CONF_RUNSTOP
+
+    def _configure(self, odr, resolution):
+        # single path programming CONFIGURATION and CONV_RATE from the
+        # cached values, used by both enable() and disable()
+        conf = self._res_conf(self._conf_cache, resolution)
+        conf = self._odr_conf(conf, odr)
+        cr = odr & 0x0F
         try:
-            cr = self._read(REG_CONV_RATE, 1)[0]
-            cr = odr & 0x0F
-            self._write(REG_CONV_RATE, cr)
-            conf = self._read(REG_CONFIGURATION, 1)[0]
-            if (odr & 0x80) >> 7:
-                conf |= 0x02
-            else:
-                conf &= 0xFD
-            self._write(REG_CONFIGURATION, conf)
-            if odr == ODR_AVAILABLE["ODR_ONE_SHOT"]:
-                self._write(REG_ONESHOT, 0xAA)
-            return True
+            # registers already holding the right value are not rewritten
+            if conf != self._conf_cache:
+                self._write(REG_CONFIGURATION, conf)
+                self._conf_cache = conf
+            if cr != self._cr_cache:
+                self._write(REG_CONV_RATE, cr)
+                self._cr_cache = cr
+            if odr == _ODR_ONE_SHOT:
+                self.start_temp()
         except Exception as e:
             # print(e)
             return False
+        self.odr = odr
+        self.resolution = resolution
+        return True
 
     def enable(self, odr=ODR_AVAILABLE["ODR_125mHz"], resolution=STTS751_RES_12):
         """
@@ -192,21 +315,13 @@ class STTS751():
 
 
         """
-        if odr not in [x for x in ODR_AVAILABLE.values()]:
+        if odr not in _ODR_VALUES:
             raise ValueError
         if odr == self.odr and resolution == self.resolution:
             return True
-        if odr == ODR_AVAILABLE["ODR_16Hz"] and resolution == STTS751_RES_12:
+        if (odr, resolution) in _FORBIDDEN:
             raise ValueError
-        if odr == ODR_AVAILABLE["ODR_32Hz"] and resolution in (STTS751_RES_12, STTS751_RES_11):
-            raise ValueError
-        res = self._set_resolution(resolution)
-        if res:
-            res = self._set_odr(odr)
-            if res:
-                self.odr = odr
-                self.resolution = resolution
-        return res
+        return self._configure(odr, resolution)
 
 
     def disable(self):
@@ -219,12 +334,9 @@ class STTS751():
         Returns True if configuration is successful, False otherwise.
 
         """
-        if self.odr == ODR_AVAILABLE["ODR_OFF"]:
+        if self.odr == _ODR_OFF:
             return True
-        res = self._set_odr(ODR_AVAILABLE["ODR_OFF"])
-        if res:
-            self.odr = ODR_AVAILABLE["ODR_OFF"]
-        return res
+        return self._configure(_ODR_OFF, self.resolution)
 
     def get_status(self):
         """
@@ -245,13 +357,13 @@ class STTS751():
             ====== =============================== 
 
         """
-        status = self._read(REG_STATUS, 1)[0]
+        status = self._read_into(REG_STATUS, bytearray(1))[0]
         st_dict = {
-            "busy"  : True if status & 0x80 >> 7 else False,
-            "t_low" : True if status & 0x40 >> 6 else False,
-            "t_high": True if status & 0x20 >> 5 else False,
-            "therm" : True if status & 0x01 else False,
-        }   
+            "busy"  : bool(status & STATUS_BUSY),
+            "t_low" : bool(status & STATUS_LOW),
+            "t_high": bool(status & STATUS_THIGH),
+            "therm" : bool(status & STATUS_THURM),
+        }
         return st_dict
 
 
@@ -265,33 +377,134 @@ class STTS751():
         Returns product_id, manufacturer_id, revision_id
 
         """
-        product_id      = self._read(REG_PRODUCT_ID, 1)[0]
-        manufacturer_id = self._read(REG_MFG_ID, 1)[0]
-        revision_id     = self._read(REG_REVISION_ID, 1)[0]
+        product_id      = self._read_into(REG_PRODUCT_ID, self._r1)[0]
+        manufacturer_id = self._read_into(REG_MFG_ID, self._r1)[0]
+        revision_id     = self._read_into(REG_REVISION_ID, self._r1)[0]
         return product_id, manufacturer_id, revision_id
 
+    def start_temp(self):
+        """
+
+.. method:: start_temp()
+
+        Triggers a one-shot conversion and returns immediately. Meaningful only when the sensor is in standby (``ODR_OFF`` or ``ODR_ONE_SHOT``).
+        Use :meth:`temp_ready` to check for the end of the conversion and :meth:`read_temp` to retrieve the result.
+
+        """
+        self._write(REG_ONESHOT, 0xAA)
+
+    def temp_ready(self):
+        """
+
+.. method:: temp_ready()
+
+        Returns True if no conversion is in progress, False otherwise.
+
+        """
+        return not (self._read_into(REG_STATUS, self._r1)[0] & STATUS_BUSY)
+
+    def read_temp(self, raw=False):
+        """
+
+.. method:: read_temp(raw=False)
+
+        Reads the last converted temperature without triggering a new conversion; if raw flag is enabled, returns raw register values.
+
+        Returns temp
+
+        """
+        # read (TEMP_H/TEMP_L with tearing check) and conversion are done
+        # natively, see csrc/stts751.c
+        return _stts751_read_temp(self.port.drvid, self.port.addr, raw)
+
     def get_temp(self, raw=False):
         """
 
 .. method:: get_temp(raw=False)
 
         Retrieves temperature in one call; if raw flag is enabled, returns raw register values.
+        If the sensor is in standby, a one-shot conversion is triggered and waited for: the call sleeps for the conversion time of the current
+        resolution (20 ms at 9 bit up to 160 ms at 12 bit), then polls the busy flag; raises TimeoutError if the conversion is not complete within twice that time.
 
         Returns temp
 
         """
-        
-        tmp_h = self._read(REG_TEMPERATURE_H, 1)[0]
-        tmp_l = self._read(REG_TEMPERATURE_L, 1)[0]
+        if self.odr in (_ODR_OFF, _ODR_ONE_SHOT):
+            conv_ms = _CONV_TIME_MS[self.resolution]
+            self.start_temp()
+            sleep(conv_ms)
+            t0 = timers.now()
+            while not self.temp_ready():
+                if timers.now() - t0 > conv_ms:
+                    raise TimeoutError
+                sleep(_CONV_POLL_MS)
+        return self.read_temp(raw)
+
+    def wait_for_event(self, timeout=-1):
+        """
 
-        tmp_raw = (tmp_h << 8) + tmp_l
-        if raw:
-            return tmp_raw
+.. method:: wait_for_event(timeout=-1)
+
+        Blocks until the sensor asserts its interrupt pin (temperature out of the low/high thresholds, see :meth:`set_event_interrupt`)
+        or until *timeout* milliseconds have elapsed (-1 waits forever). Requires the *int_pin* parameter in the constructor.
+
+        Returns a tuple (status, temp) where status is the dictionary returned by :meth:`get_status`, or None on timeout.
+
+        """
+        if self._int_event is None:
+            raise RuntimeError
+        self._int_event.wait(timeout)
+        if not self._int_event.is_set():
+            return None
+        # clear before reading: an edge arriving from here on is kept for
+        # the next call
+        self._int_event.clear()
+        return self.get_status(), self.read_temp()
+
+    def read_samples(self, n, period_ms):
+        """
+
+.. method:: read_samples(n, period_ms)
 
-        if ((tmp_raw & 0x8000) >> 15):
-            tmp_raw = -(0x8000 - (0x7fff & tmp_raw))
+        Captures *n* temperature samples spaced by *period_ms* milliseconds. Sampling runs natively into a preallocated buffer;
+        samples are converted to °C only when the capture is complete. *period_ms* should not be shorter than the configured ODR period.
+        The sensor must be converting continuously: in standby (``ODR_OFF`` or ``ODR_ONE_SHOT``, e.g. the "low_power" profile)
+        no new conversions would happen during the capture, so RuntimeError is raised.
 
-        return tmp_raw / 256.0
+        Returns a list of temperatures.
+
+        """
+        if self.odr in (_ODR_OFF, _ODR_ONE_SHOT):
+            raise RuntimeError
+        buf = bytearray(2 * n)
+        _stts751_read_samples(self.port.drvid, self.port.addr, buf, n, period_ms)
+        return [self._decode(buf[2 * i], buf[2 * i + 1]) for i in range(n)]
+
+    def next_poll_interval(self, temp):
+        """
+
+.. method:: next_poll_interval(temp)
+
+        Suggests how long to wait before the next reading, based on the distance of *temp* from the nearest temperature threshold:
+        the closer the temperature is to the low or high threshold, the shorter the interval.
+
+            ===================== =============
+            Distance              Interval
+            ===================== =============
+            more than 10 °C       30000 ms
+            more than 2 °C        5000 ms
+            2 °C or less          500 ms
+            ===================== =============
+
+        Returns the interval in milliseconds.
+
+        """
+        dist = min(abs(temp - self.low_th), abs(temp - self.high_th))
+        if dist > 10:
+            return 30000
+        if dist > 2:
+            return 5000
+        return 500
 
     def set_low_temp_threshold(self, level):
         """
@@ -301,11 +514,7 @@ class STTS751():
         Sets the low temperature threshold. When real temperature goes down the low temperature level, if interrupt is enabled, the sensor send an interrupt signal in its interrupt pin.
 
         """
-        raw = level * 256
-        rl = raw & 0x00FF
-        rh = (raw & 0xFF00) >> 8
-        self._write(REG_LOW_LIMIT_L ,rl)
-        self._write(REG_LOW_LIMIT_H ,rh)
+        self._write_threshold(REG_LOW_LIMIT_H, level)
         self.low_th = level
 
     def set_high_temp_threshold(self, level):
@@ -316,13 +525,22 @@ class STTS751():
         Sets the high temperature threshold. When real temperature goes up the high temperature level, if interrupt is enabled, the sensor send an interrupt signal in its interrupt pin.
 
         """
-        raw = level * 256
-        rl = raw & 0x00FF
-        rh = (raw & 0xFF00) >> 8
-        self._write(REG_HIGH_LIMIT_L ,rl)
-        self._write(REG_HIGH_LIMIT_H ,rh)
+        self._write_threshold(REG_HIGH_LIMIT_H, level)
         self.high_th = level
 
+    def set_thresholds(self, low, high):
+        """
+
+.. method:: set_thresholds(low, high)
+
+        Sets both the low and the high temperature thresholds in one call (see :meth:`set_low_temp_threshold` and :meth:`set_high_temp_threshold`).
+
+        """
+        self._write_threshold(REG_HIGH_LIMIT_H, high)
+        self._write_threshold(REG_LOW_LIMIT_H, low)
+        self.low_th = low
+        self.high_th = high
+
     def set_event_interrupt(self, enable):
         """
 
@@ -331,12 +549,13 @@ class STTS751():
         Enables the interrupt pin. Available values for 'enable' flag are 'True' or 'False'.
 
         """
-        conf = self._read(REG_CONFIGURATION, 1)[0]
+        # MASK1 set means the event interrupt is masked
         if enable:
-            conf &= 0b0111111
+            conf = self._conf_cache & ~CONF_MASK1
         else:
-            conf |= 0b1000000
+            conf = self._conf_cache | CONF_MASK1
         self._write(REG_CONFIGURATION, conf)
+        self._conf_cache = conf
         self.int_enable = enable  
 
     def set_therm_limit(self, level):
@@ -348,9 +567,7 @@ class STTS751():
         Available 'level' values are from -127 to 127 range.
         
         """
-        if level < -127 or level > 127:
-            raise ValueError
-        self._write(REG_THERM, level)
+        self._write(REG_THERM, _s8(level))
         self.therm_limit = level
 
     def set_therm_hysteresis_limit(self, level):
@@ -362,9 +579,7 @@ class STTS751():
         Available 'level' values are from -127 to 127 range.
         
         """
-        if level < -127 or level > 127:
-            raise ValueError
-        self._write(REG_THERM_HYSTERESIS, level)
+        self._write(REG_THERM_HYSTERESIS, _s8(level))
         self.therm_hyst_limit = level
 
     def set_timeout(self, enable):
@@ -375,12 +590,12 @@ class STTS751():
         Enables the timeout for the sensor readings (from 25 to 35 ms). Available values for 'enable' flag are 'True' or 'False'.
 
         """
-        reg = self._read(REG_SMBUS_TIMEOUT, 1)[0]
         if enable:
-            reg &= 0b0111111
+            reg = self._to_cache | SMBUS_TIMEOUT_EN
         else:
-            reg |= 0b1000000
+            reg = self._to_cache & ~SMBUS_TIMEOUT_EN
         self._write(REG_SMBUS_TIMEOUT, reg)
+        self._to_cache = reg
         self.timeout = enable    
         
 